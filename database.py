@@ -6,10 +6,11 @@ Import and use these functions in your API endpoints for database operations.
 """
 
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import List, Tuple, Union
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -17,6 +18,9 @@ load_dotenv()
 
 _client = None
 db = None
+# Async handle for use inside `async def` endpoints
+_async_client = None
+async_db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
@@ -24,6 +28,8 @@ database_name = os.getenv("DATABASE_NAME")
 if database_url and database_name:
     _client = MongoClient(database_url)
     db = _client[database_name]
+    _async_client = AsyncIOMotorClient(database_url)
+    async_db = _async_client[database_name]
 
 # Helper functions for common database operations
 def create_document(collection_name: str, data: Union[BaseModel, dict]):
@@ -37,8 +43,9 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
 
     result = db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
@@ -53,3 +60,50 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+def _group_documents(items: List[Tuple[str, Union[BaseModel, dict]]]):
+    """Timestamp documents and group them by collection, remembering input positions"""
+    # One timestamp for the whole batch
+    now = datetime.now(timezone.utc)
+    grouped = {}
+    for position, (collection_name, data) in enumerate(items):
+        if isinstance(data, BaseModel):
+            data_dict = data.model_dump()
+        else:
+            data_dict = data.copy()
+
+        data_dict['created_at'] = now
+        data_dict['updated_at'] = now
+        grouped.setdefault(collection_name, []).append((position, data_dict))
+    return grouped
+
+def create_documents_bulk(items: List[Tuple[str, Union[BaseModel, dict]]]):
+    """Insert several documents with timestamps, one insert_many per collection"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    # Return ids in the same order as the input items
+    inserted_ids = [None] * len(items)
+    for collection_name, entries in _group_documents(items).items():
+        result = db[collection_name].insert_many([doc for _, doc in entries], ordered=False)
+        for (position, _), inserted_id in zip(entries, result.inserted_ids):
+            inserted_ids[position] = str(inserted_id)
+    return inserted_ids
+
+# Async variants for `async def` endpoints (Motor)
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp without blocking the event loop"""
+    ids = await create_documents_bulk_async([(collection_name, data)])
+    return ids[0]
+
+async def create_documents_bulk_async(items: List[Tuple[str, Union[BaseModel, dict]]]):
+    """Async create_documents_bulk: one insert_many per collection"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    inserted_ids = [None] * len(items)
+    for collection_name, entries in _group_documents(items).items():
+        result = await async_db[collection_name].insert_many([doc for _, doc in entries], ordered=False)
+        for (position, _), inserted_id in zip(entries, result.inserted_ids):
+            inserted_ids[position] = str(inserted_id)
+    return inserted_ids
@@ -1,23 +1,52 @@
+import email.message
+import json
+import logging
 import os
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-
-from fastapi import FastAPI, HTTPException
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import List, Literal, NamedTuple, Optional, Dict, Any
+from datetime import datetime, timezone
+
+import orjson
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, EmailStr
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.openapi.models import OpenAPI
+from fastapi.openapi.utils import validation_error_definition, validation_error_response_definition
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
 
 # Database helpers
-from database import db, create_document, get_documents
+from database import async_db, create_documents_bulk_async, get_documents
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title="AI Business Assistant Generator",
+    version="1.1.1",
+    default_response_class=ORJSONResponse,
+)
 
-app = FastAPI(title="AI Business Assistant Generator", version="1.1.1")
+# Comma-separated list of allowed origins. With none configured, cross-origin
+# requests are refused, except that ENV=development allows any origin.
+_CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
+if not _CORS_ORIGINS and os.getenv("ENV") == "development":
+    _CORS_ORIGINS = ["*"]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=_CORS_ORIGINS,
+    # credentials only for an explicit allowlist; with the wildcard Starlette
+    # would reflect every origin
+    allow_credentials=bool(_CORS_ORIGINS) and "*" not in _CORS_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
 )
+# /generate responses are large JSON documents; small ones aren't worth compressing
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 
 # -----------------------------
@@ -25,7 +54,8 @@ app.add_middleware(
 # -----------------------------
 class Contact(BaseModel):
     name: Optional[str] = Field(None)
-    email: Optional[EmailStr] = Field(None)
+    # shape check only; full RFC parsing via email-validator isn't needed here
+    email: Optional[str] = Field(None, pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
     phone: Optional[str] = Field(None)
 
 class BusinessInput(BaseModel):
@@ -40,10 +70,15 @@ class BusinessInput(BaseModel):
     brand_voice: Optional[str] = Field(None, description="Extra brand voice notes")
     faqs: List[Dict[str, str]] = Field(default_factory=list, description="[{question, answer}]")
     examples: List[str] = Field(default_factory=list, description="Example customer interactions or phrases")
-    subscription_tier: str = Field(..., description="starter | standard | premium")
+    subscription_tier: Literal["starter", "standard", "premium"] = Field(..., description="starter | standard | premium")
     website_url: Optional[str] = None
     contact: Optional[Contact] = None
 
+    @field_validator("subscription_tier", mode="before")
+    @classmethod
+    def lowercase_tier(cls, value: Any) -> Any:
+        return value.lower() if isinstance(value, str) else value
+
 class GenerationResult(BaseModel):
     # Existing sections
     business_summary: str
@@ -74,177 +109,239 @@ class GenerationResult(BaseModel):
 # Helper generation utilities
 # -----------------------------
 
-def sentence_list(items: List[str]) -> str:
-    return ", ".join(items)
+_DEFAULT_GOALS = "brand growth and customer satisfaction"
+# deletion table for hashtags and URL slugs
+_STRIP_SPACES = str.maketrans("", "", " \t\n")
 
 
-def make_business_summary(data: BusinessInput) -> str:
+def make_business_summary(data: BusinessInput, services_csv: str, goals_csv: str) -> str:
     return (
         f"{data.business_name} is a {data.tone} {data.industry} brand based in {data.location}. "
-        f"They offer {sentence_list(data.services)} to {data.target_audience}. "
-        f"Primary goals: {sentence_list(data.goals) or 'brand growth and customer satisfaction'}."
+        f"They offer {services_csv} to {data.target_audience}. "
+        f"Primary goals: {goals_csv}."
     )
 
 
+# Constant string lists are shared tuples; orjson and BSON encode them as arrays.
+_TYPOGRAPHY = ("Inter", "Manrope", "Geist")
+_VALUE_PROPS = (
+    "Fast response times",
+    "Clear pricing",
+    "Expert support",
+)
+
+
 def make_brand_identity(data: BusinessInput) -> Dict[str, Any]:
     return {
         "colors": data.brand_colors,
-        "typography": ["Inter", "Manrope", "Geist"],
+        "typography": _TYPOGRAPHY,
         "voice": data.brand_voice or f"{data.tone}, clear, helpful, conversion-focused",
         "keywords": [data.industry, data.location, *data.services],
-        "value_props": [
-            "Fast response times",
-            "Clear pricing",
-            "Expert support",
-        ],
+        "value_props": _VALUE_PROPS,
     }
 
 
+_TIER_RANK = {"starter": 0, "standard": 1, "premium": 2}
+# map features to min tier
+_FEATURE_MIN = {
+    "basic": 0,
+    "website": 1,
+    "ads": 1,
+    "booking": 1,
+    "caller_bot": 2,
+    "crm": 2,
+    "full_builder": 2,
+    "voice_support": 2,
+    "analytics_full": 2,
+    "domain_hosting": 2,
+}
+# (tier, feature) pairs that are unlocked, resolved once at import
+_ALLOWED = frozenset(
+    (tier, feature)
+    for tier, rank in _TIER_RANK.items()
+    for feature, min_rank in _FEATURE_MIN.items()
+    if rank >= min_rank
+)
+
+
 def tier_includes(feature: str, tier: str) -> bool:
-    order = {"starter": 0, "standard": 1, "premium": 2}
-    # map features to min tier
-    gates = {
-        "basic": 0,
-        "website": 1,
-        "ads": 1,
-        "booking": 1,
-        "caller_bot": 2,
-        "crm": 2,
-        "full_builder": 2,
-        "voice_support": 2,
-        "analytics_full": 2,
-        "domain_hosting": 2,
-    }
-    return order.get(tier, 0) >= gates.get(feature, 0)
+    return (tier, feature) in _ALLOWED
+
+
+class TierFlags(NamedTuple):
+    website: bool
+    ads: bool
+    booking: bool
+    caller_bot: bool
+    crm: bool
+    full_builder: bool
+    voice_support: bool
+    analytics_full: bool
+    domain_hosting: bool
 
 
-def make_chatbot_persona(data: BusinessInput) -> Dict[str, Any]:
+def compute_tier_flags(tier: str) -> TierFlags:
+    return TierFlags(*(tier_includes(feature, tier) for feature in TierFlags._fields))
+
+
+# one immutable flag set per tier, so a request only does a single dict lookup
+_TIER_FLAGS = {tier: compute_tier_flags(tier) for tier in _TIER_RANK}
+
+
+_POLICIES = ("Be polite", "Never promise unavailable offers", "Escalate complex issues")
+# joined once at import for the policies RAG chunk
+_POLICY_CHUNK = "; ".join(("Response within 5 minutes", "Refunds per policy", "Escalation to human on request"))
+_CAPABILITIES = (
+    "Customer service",
+    "Sales qualification",
+    "Lead capture",
+    "FAQ handling",
+    "Product explanation",
+    "Content generation",
+    "Appointment scheduling",
+    "CRM entry",
+)
+_LEAD_FIELDS = ("name", "email", "phone", "need")
+_BEHAVIOR_RULES = (
+    "Mirror brand tone and stay concise",
+    "Always propose next step (book, call, order, contact)",
+    "Ask one clarifying question before giving long answers",
+    "Offer links and quick actions when relevant",
+)
+_CONVERSATION_STRUCTURE = (
+    "Greet → clarify need",
+    "Match intent → provide answer",
+    "Offer next step with buttons",
+    "Confirm satisfaction or escalate",
+)
+_QUICK_ACTIONS = ("Book", "Get quote", "Talk to human", "See pricing", "Contact")
+_CHAT_BUTTONS = (
+    {"label": "Book", "action": "open_booking"},
+    {"label": "Order", "action": "open_checkout"},
+    {"label": "Contact", "action": "open_contact"},
+)
+
+
+def make_chatbot_persona(data: BusinessInput, business_summary: str, services_csv: str) -> Dict[str, Any]:
+    name, tone = data.business_name, data.tone
     system_prompt = (
-        f"You are {data.business_name}'s AI assistant. Tone: {data.tone}. "
+        f"You are {name}'s AI assistant. Tone: {tone}. "
         f"Industry: {data.industry}. Target audience: {data.target_audience}."
     )
     knowledge = {
-        "business_description": make_business_summary(data),
+        "business_description": business_summary,
         "services": data.services,
-        "policies": ["Be polite", "Never promise unavailable offers", "Escalate complex issues"],
+        "policies": _POLICIES,
         "goals": data.goals,
         "faqs": data.faqs,
         "examples": data.examples,
         # RAG-ready chunks
         "rag_chunks": [
-            {"type": "services", "content": sentence_list(data.services)},
-            {"type": "policies", "content": "; ".join(["Response within 5 minutes", "Refunds per policy", "Escalation to human on request"])},
+            {"type": "services", "content": services_csv},
+            {"type": "policies", "content": _POLICY_CHUNK},
             {"type": "about", "content": f"Operating in {data.location}. Audience: {data.target_audience}."},
         ],
-        "capabilities": [
-            "Customer service",
-            "Sales qualification",
-            "Lead capture",
-            "FAQ handling",
-            "Product explanation",
-            "Content generation",
-            "Appointment scheduling",
-            "CRM entry",
-        ],
+        "capabilities": _CAPABILITIES,
     }
     outputs = {
-        "greeting": f"Hi! You're speaking with the {data.business_name} AI assistant — how can I help today?",
-        "lead_form_fields": ["name", "email", "phone", "need"],
-        "behavior_rules": [
-            "Mirror brand tone and stay concise",
-            "Always propose next step (book, call, order, contact)",
-            "Ask one clarifying question before giving long answers",
-            "Offer links and quick actions when relevant",
-        ],
+        "greeting": f"Hi! You're speaking with the {name} AI assistant — how can I help today?",
+        "lead_form_fields": _LEAD_FIELDS,
+        "behavior_rules": _BEHAVIOR_RULES,
         "response_style": {
             "format": "short paragraphs with bullet highlights",
-            "voice": data.brand_voice or data.tone,
+            "voice": data.brand_voice or tone,
             "cta": "Use strong, specific CTAs",
         },
-        "conversation_structure": [
-            "Greet → clarify need",
-            "Match intent → provide answer",
-            "Offer next step with buttons",
-            "Confirm satisfaction or escalate",
-        ],
-        "quick_actions": ["Book", "Get quote", "Talk to human", "See pricing", "Contact"],
-        "buttons": [
-            {"label": "Book", "action": "open_booking"},
-            {"label": "Order", "action": "open_checkout"},
-            {"label": "Contact", "action": "open_contact"},
-        ],
+        "conversation_structure": _CONVERSATION_STRUCTURE,
+        "quick_actions": _QUICK_ACTIONS,
+        "buttons": _CHAT_BUTTONS,
     }
     return {"system_prompt": system_prompt, "knowledge": knowledge, "outputs": outputs}
 
 
-def make_website_structure(data: BusinessInput, tier: str) -> Dict[str, Any]:
+def make_website_structure(data: BusinessInput, flags: TierFlags, services_csv: str) -> Dict[str, Any]:
+    name, industry, location, services = data.business_name, data.industry, data.location, data.services
     base = {
         "pages": [
             {"path": "/", "title": "Home"},
             {"path": "/about", "title": "About"},
-            {"path": "/services", "title": "Services", "items": data.services},
+            {"path": "/services", "title": "Services", "items": services},
             {"path": "/pricing", "title": "Pricing"},
             {"path": "/contact", "title": "Contact"},
         ],
         "seo": {
-            "title": f"{data.business_name} | {data.industry} in {data.location}",
-            "description": f"{data.business_name} offers {sentence_list(data.services)} in {data.location}.",
-            "keywords": [data.business_name, data.industry, data.location, *data.services],
+            "title": f"{name} | {industry} in {location}",
+            "description": f"{name} offers {services_csv} in {location}.",
+            "keywords": [name, industry, location, *services],
         },
         "theme": {"colors": data.brand_colors, "tone": data.tone},
     }
-    if tier_includes("website", tier):
+    if flags.website:
         base["integrations"] = {"chat_widget": True, "booking": True}
     return base
 
 
-def make_social_plan(data: BusinessInput, tier: str) -> Dict[str, Any]:
-    base_calendar = [
-        {"day": i + 1, "theme": theme}
-        for i, theme in enumerate([
-            "Brand story",
-            "How it works",
-            "Customer testimonial",
-            "Service spotlight",
-            "Behind the scenes",
-            "FAQ of the week",
-            "Offer/CTA",
-        ] * 4)
-    ][:30]
+_SOCIAL_THEMES = (
+    "Brand story",
+    "How it works",
+    "Customer testimonial",
+    "Service spotlight",
+    "Behind the scenes",
+    "FAQ of the week",
+    "Offer/CTA",
+)
+# independent of the request, so built once and returned as-is; the tuple and
+# its entries are never mutated
+_CALENDAR_30_DAY = tuple(
+    {"day": i + 1, "theme": theme}
+    for i, theme in enumerate(_SOCIAL_THEMES * 4)
+)[:30]
+
+
+_AD_ANGLES = (
+    "Pain-Agitate-Solve for top problem",
+    "Time-saving benefit angle",
+    "Local authority angle",
+)
+_AD_PLATFORMS = ("Instagram", "Facebook", "Google", "TikTok")
+_ORGANIC_PLATFORMS = ("Instagram", "Facebook")
+
 
+def make_social_plan(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
     base = {
-        "calendar_30_day": base_calendar,
+        "calendar_30_day": _CALENDAR_30_DAY,
         "captions_style": f"{data.tone} with clear CTAs",
-        "hashtags": [f"#{data.industry.replace(' ', '')}", f"#{data.location.replace(' ', '')}", "#SmallBusiness", "#Tips"],
+        "hashtags": [f"#{data.industry.translate(_STRIP_SPACES)}", f"#{data.location.translate(_STRIP_SPACES)}", "#SmallBusiness", "#Tips"],
     }
-    if tier_includes("ads", tier):
-        base["ad_angles"] = [
-            "Pain-Agitate-Solve for top problem",
-            "Time-saving benefit angle",
-            "Local authority angle",
-        ]
-        base["platforms"] = ["Instagram", "Facebook", "Google", "TikTok"]
+    if flags.ads:
+        base["ad_angles"] = _AD_ANGLES
+        base["platforms"] = _AD_PLATFORMS
     else:
-        base["platforms"] = ["Instagram", "Facebook"]
+        base["platforms"] = _ORGANIC_PLATFORMS
     return base
 
 
-def make_booking_tools(data: BusinessInput, tier: str) -> Dict[str, Any]:
+_BASIC_REMINDERS = ("email",)
+_FULL_REMINDERS = ("email", "sms", "whatsapp")
+
+
+def make_booking_tools(data: BusinessInput, flags: TierFlags, domain_root: str) -> Dict[str, Any]:
     base = {
-        "booking_link": f"https://book.{data.business_name.lower().replace(' ', '')}.ai",
-        "reminders": ["email"],
+        "booking_link": f"https://book.{domain_root}.ai",
+        "reminders": _BASIC_REMINDERS,
         "confirmation_messages": {
             "email": "Thanks for booking with us!",
         },
         "calendar_sync": False,
     }
-    if tier_includes("booking", tier):
-        base["reminders"] = ["email", "sms", "whatsapp"]
+    if flags.booking:
+        base["reminders"] = _FULL_REMINDERS
         base["calendar_sync"] = True
     return base
 
 
-def make_sales_ads(data: BusinessInput, tier: str) -> Dict[str, Any]:
+def make_sales_ads(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
+    top_service = data.services[0]
     base = {
         "funnels": [
             {
@@ -255,93 +352,125 @@ def make_sales_ads(data: BusinessInput, tier: str) -> Dict[str, Any]:
         "ad_ideas": [
             {
                 "platform": "Facebook",
-                "headline": f"{data.business_name}: {data.services[0]} in {data.location}",
-                "copy": f"Tired of guessing? Try our {data.services[0]} — trusted by locals.",
+                "headline": f"{data.business_name}: {top_service} in {data.location}",
+                "copy": f"Tired of guessing? Try our {top_service} — trusted by locals.",
             }
         ],
     }
-    if tier_includes("ads", tier):
+    if flags.ads:
         base["generators"] = ["FB/IG primary text", "Google RSA headlines", "TikTok hooks"]
     return base
 
 
-def make_sops(data: BusinessInput, tier: str) -> List[str]:
+def make_sops(data: BusinessInput, flags: TierFlags) -> List[str]:
     sops = [
         "Inbound chat triage and escalation",
         "Lead capture and CRM entry",
         "Daily social posting routine",
     ]
-    if tier_includes("website", tier):
+    if flags.website:
         sops.append("Appointment scheduling and no-show follow-up")
-    if tier_includes("caller_bot", tier):
+    if flags.caller_bot:
         sops.append("Automated call reminders and voicemail drop")
     return sops
 
 
-def make_automations(data: BusinessInput, tier: str) -> Dict[str, Any]:
-    base = {
-        "workflows": [
-            {
-                "name": "Lead capture → follow up → booking",
-                "trigger": "New lead",
-                "actions": ["Send welcome email", "Create CRM contact", "Offer booking link"],
-            },
-            {
-                "name": "New customer → onboarding",
-                "trigger": "First purchase",
-                "actions": ["Send onboarding guide", "Invite to portal"],
-            },
-        ],
-        "triggers": [
-            "New website chat",
-            "Form submission",
-            "New booking",
-        ],
-        "actions": [
-            "Send confirmation email",
-            "Create CRM contact",
-            "Notify team Slack",
-        ],
-    }
-    if tier_includes("crm", tier):
-        base["integrations"] = ["CRM", "WhatsApp", "Facebook", "Instagram", "Calendar"]
-    else:
-        base["integrations"] = ["Email", "Calendar"]
-    return base
+_AUTOMATION_WORKFLOWS = (
+    {
+        "name": "Lead capture → follow up → booking",
+        "trigger": "New lead",
+        "actions": ("Send welcome email", "Create CRM contact", "Offer booking link"),
+    },
+    {
+        "name": "New customer → onboarding",
+        "trigger": "First purchase",
+        "actions": ("Send onboarding guide", "Invite to portal"),
+    },
+)
+_AUTOMATION_TRIGGERS = (
+    "New website chat",
+    "Form submission",
+    "New booking",
+)
+_AUTOMATION_ACTIONS = (
+    "Send confirmation email",
+    "Create CRM contact",
+    "Notify team Slack",
+)
+_CRM_INTEGRATIONS = ("CRM", "WhatsApp", "Facebook", "Instagram", "Calendar")
+_BASIC_INTEGRATIONS = ("Email", "Calendar")
 
 
-def make_dashboard(data: BusinessInput, tier: str) -> Dict[str, Any]:
-    roles = [
-        {"name": "AI Receptionist", "status": "ready"},
-        {"name": "AI Support Agent", "status": "ready"},
-        {"name": "AI Content Creator", "status": "ready"},
-    ]
-    if tier_includes("ads", tier):
-        roles.append({"name": "AI Ad Expert", "status": "ready"})
-        roles.append({"name": "AI Social Media Manager", "status": "ready"})
-    if tier_includes("voice_support", tier):
-        roles.extend([
-            {"name": "AI Sales Agent", "status": "ready"},
-            {"name": "AI Booking & Scheduling Assistant", "status": "ready"},
-            {"name": "AI Financial Assistant", "status": "ready"},
-            {"name": "24/7 Multi-platform Assistant", "status": "ready"},
-        ])
-    analytics = {
-        "level": "basic" if not tier_includes("analytics_full", tier) else "full",
-        "widgets": ["Leads", "Bookings", "Messages", "Traffic", "Revenue"] if tier_includes("analytics_full", tier) else ["Leads", "Bookings", "Messages"],
+def make_automations(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
+    return {
+        "workflows": _AUTOMATION_WORKFLOWS,
+        "triggers": _AUTOMATION_TRIGGERS,
+        "actions": _AUTOMATION_ACTIONS,
+        "integrations": _CRM_INTEGRATIONS if flags.crm else _BASIC_INTEGRATIONS,
     }
+
+
+_BASE_ROLES = (
+    {"name": "AI Receptionist", "status": "ready"},
+    {"name": "AI Support Agent", "status": "ready"},
+    {"name": "AI Content Creator", "status": "ready"},
+)
+_AD_ROLES = (
+    {"name": "AI Ad Expert", "status": "ready"},
+    {"name": "AI Social Media Manager", "status": "ready"},
+)
+_VOICE_ROLES = (
+    {"name": "AI Sales Agent", "status": "ready"},
+    {"name": "AI Booking & Scheduling Assistant", "status": "ready"},
+    {"name": "AI Financial Assistant", "status": "ready"},
+    {"name": "24/7 Multi-platform Assistant", "status": "ready"},
+)
+_FULL_ANALYTICS = {"level": "full", "widgets": ("Leads", "Bookings", "Messages", "Traffic", "Revenue")}
+_BASIC_ANALYTICS = {"level": "basic", "widgets": ("Leads", "Bookings", "Messages")}
+
+
+def make_dashboard(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
+    roles = list(_BASE_ROLES)
+    if flags.ads:
+        roles.extend(_AD_ROLES)
+    if flags.voice_support:
+        roles.extend(_VOICE_ROLES)
+    analytics = _FULL_ANALYTICS if flags.analytics_full else _BASIC_ANALYTICS
     return {"roles": roles, "analytics": analytics}
 
 
+_SOCIAL_PROVIDERS = ("Facebook", "Instagram", "TikTok", "YouTube", "LinkedIn", "Twitter")
+_SOCIAL_OAUTH = {
+    "prompt": "Connect your existing social accounts. We won't create new ones.",
+    "providers": _SOCIAL_PROVIDERS,
+    "status": {p.lower(): "disconnected" for p in _SOCIAL_PROVIDERS},
+}
+
+
 def make_social_oauth(data: BusinessInput) -> Dict[str, Any]:
-    return {
-        "prompt": "Connect your existing social accounts. We won't create new ones.",
-        "providers": ["Facebook", "Instagram", "TikTok", "YouTube", "LinkedIn", "Twitter"],
-        "status": {p.lower(): "disconnected" for p in ["Facebook", "Instagram", "TikTok", "YouTube", "LinkedIn", "Twitter"]},
-    }
+    return _SOCIAL_OAUTH
+
+
+_INTEGRATE_OUTPUTS = (
+    "Updated pages",
+    "SEO improvements",
+    "Booking widget",
+    "Chat widget",
+    "Analytics integration",
+    "New service pages",
+    "Blog content",
+)
+_CREATE_OUTPUTS = (
+    "Full modern website",
+    "Home/Services/About/Contact/Pricing pages",
+    "Booking system",
+    "Chatbot widget",
+    "SEO metadata",
+    "Branding style based on colors",
+)
 
 
-def make_website_actions(data: BusinessInput, tier: str) -> Dict[str, Any]:
+def make_website_actions(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
     has_site = bool(data.website_url)
     if has_site:
         return {
@@ -352,125 +481,280 @@ def make_website_actions(data: BusinessInput, tier: str) -> Dict[str, Any]:
                 "cms": "(WordPress, Wix, custom, etc.)",
                 "access_method": "(API, admin login, CPanel, FTP)",
             },
-            "generate": [
-                "Updated pages",
-                "SEO improvements",
-                "Booking widget",
-                "Chat widget",
-                "Analytics integration",
-                "New service pages",
-                "Blog content",
-            ],
+            "generate": _INTEGRATE_OUTPUTS,
         }
     else:
         actions = {
             "mode": "create",
-            "generate": [
-                "Full modern website",
-                "Home/Services/About/Contact/Pricing pages",
-                "Booking system",
-                "Chatbot widget",
-                "SEO metadata",
-                "Branding style based on colors",
-            ],
+            "generate": _CREATE_OUTPUTS,
             "deployment": {
-                "hosting_setup": tier_includes("domain_hosting", tier),
-                "domain_purchase": tier_includes("domain_hosting", tier),
-                "automatic_deployment": tier_includes("domain_hosting", tier),
+                "hosting_setup": flags.domain_hosting,
+                "domain_purchase": flags.domain_hosting,
+                "automatic_deployment": flags.domain_hosting,
             },
         }
         return actions
 
 
-def make_caller_bot(data: BusinessInput, tier: str) -> Optional[Dict[str, Any]]:
-    if not tier_includes("caller_bot", tier):
+_IVR_MENU = ("Press 1 for sales", "Press 2 for support", "Press 3 for hours")
+_CALL_FLOWS = (
+    "Inbound → intent detect → book → SMS confirmation",
+    "Inbound → order capture → payment link → notify owner",
+)
+
+
+def make_caller_bot(data: BusinessInput, flags: TierFlags) -> Optional[Dict[str, Any]]:
+    if not flags.caller_bot:
         return None
     return {
         "provision_number": True,
-        "ivr_menu": ["Press 1 for sales", "Press 2 for support", "Press 3 for hours"],
+        "ivr_menu": _IVR_MENU,
         "voice_to_text": True,
-        "flows": [
-            "Inbound → intent detect → book → SMS confirmation",
-            "Inbound → order capture → payment link → notify owner",
-        ],
+        "flows": _CALL_FLOWS,
         "post_call_sms": True,
         "forward_to_owner": True,
     }
 
 
-def make_multi_platform(data: BusinessInput, tier: str) -> Dict[str, Any]:
+def make_multi_platform(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
     base = {
         "channels": ["Website", "Email"],
         "consistency": "Single persona and knowledge base shared across channels",
     }
-    if tier_includes("booking", tier):
+    if flags.booking:
         base["channels"].extend(["WhatsApp", "Instagram DMs", "Facebook Messenger"])  # via integrations
-    if tier_includes("caller_bot", tier):
+    if flags.caller_bot:
         base["channels"].append("Phone calls")
     base["channels"].append("In-app chat")
     return base
 
 
+_ALL_PLANS = {
+    "starter": {
+        "includes": ("Social media posting", "Basic chatbot", "Basic analytics"),
+        "locked": ("Website integration", "Booking system", "Multi-platform chat", "Advanced analytics", "Email/SMS automations", "Domain + hosting", "Caller bot", "CRM", "AI-generated ads", "Unlimited automations"),
+    },
+    "standard": {
+        "includes": ("Everything in Starter", "Website integration", "Booking system", "Multi-platform chat", "Advanced analytics", "Email/SMS automations"),
+        "locked": ("Domain + hosting", "Full website builder", "Caller bot", "CRM", "AI-generated ads", "Unlimited automations"),
+    },
+    "premium": {
+        "includes": ("Everything in Standard", "Domain + hosting included", "Full website builder", "Caller bot", "CRM", "AI-generated ads", "Unlimited automations", "Full digital workforce suite"),
+        "locked": (),
+    },
+}
+# the whole section only depends on the tier, so build all three up front
+_SUBSCRIPTIONS = {tier: {"current": tier, **_ALL_PLANS} for tier in _ALL_PLANS}
+
+
 def make_subscriptions(tier: str) -> Dict[str, Any]:
-    all_plans = {
-        "starter": {
-            "includes": ["Social media posting", "Basic chatbot", "Basic analytics"],
-            "locked": ["Website integration", "Booking system", "Multi-platform chat", "Advanced analytics", "Email/SMS automations", "Domain + hosting", "Caller bot", "CRM", "AI-generated ads", "Unlimited automations"],
-        },
-        "standard": {
-            "includes": ["Everything in Starter", "Website integration", "Booking system", "Multi-platform chat", "Advanced analytics", "Email/SMS automations"],
-            "locked": ["Domain + hosting", "Full website builder", "Caller bot", "CRM", "AI-generated ads", "Unlimited automations"],
-        },
-        "premium": {
-            "includes": ["Everything in Standard", "Domain + hosting included", "Full website builder", "Caller bot", "CRM", "AI-generated ads", "Unlimited automations", "Full digital workforce suite"],
-            "locked": [],
-        },
-    }
-    return {"current": tier, **all_plans}
+    return _SUBSCRIPTIONS[tier]
 
 
-def make_marketing_plan(data: BusinessInput, tier: str) -> Dict[str, Any]:
+_MARKETING_STRATEGY = (
+    "Define ICP and pain points",
+    "Create content pillars (education, proof, offer)",
+    "Run weekly offer tests",
+)
+
+
+def make_marketing_plan(data: BusinessInput, flags: TierFlags) -> Dict[str, Any]:
     channels = ["Website", "Email", "Social"]
-    if tier_includes("ads", tier):
+    if flags.ads:
         channels.append("Ads")
     return {
-        "strategy": [
-            "Define ICP and pain points",
-            "Create content pillars (education, proof, offer)",
-            "Run weekly offer tests",
-        ],
+        "strategy": _MARKETING_STRATEGY,
         "channels": channels,
         "cadence": {
             "email": "1 newsletter + 1 promotion/week",
             "social": "5 posts/week",
-            "ads": "2-3 creatives/week" if tier_includes("ads", tier) else "N/A",
+            "ads": "2-3 creatives/week" if flags.ads else "N/A",
         },
     }
 
 
 def make_seo_keywords(data: BusinessInput) -> List[str]:
+    industry, location, services = data.industry, data.location, data.services
     base = [
-        f"{data.industry} {data.location}",
-        f"best {data.services[0]} {data.location}" if data.services else data.industry,
+        f"{industry} {location}",
+        f"best {services[0]} {location}" if services else industry,
         f"{data.business_name} reviews",
-        f"{data.industry} pricing {data.location}",
+        f"{industry} pricing {location}",
     ]
     # add services
-    base.extend([f"{svc} {data.location}" for svc in data.services])
+    base.extend([f"{svc} {location}" for svc in services])
     return base
 
 
-def make_access_links(data: BusinessInput, tier: str) -> Dict[str, Any]:
-    domain_root = data.business_name.lower().replace(" ", "")
+def make_access_links(data: BusinessInput, flags: TierFlags, domain_root: str) -> Dict[str, Any]:
     links = {
-        "website": data.website_url or (f"https://{domain_root}.site" if tier_includes("domain_hosting", tier) else None),
+        "website": data.website_url or (f"https://{domain_root}.site" if flags.domain_hosting else None),
         "booking": f"https://book.{domain_root}.ai",
         "admin_portal": f"https://admin.{domain_root}.ai",
-        "chat_widget": f"https://{domain_root}.site/chat" if data.website_url or tier_includes("domain_hosting", tier) else None,
+        "chat_widget": f"https://{domain_root}.site/chat" if data.website_url or flags.domain_hosting else None,
     }
     return links
 
 
+def build_payload(data: BusinessInput, tier: str) -> Dict[str, Any]:
+    # Every section except created_at, built in one pass.
+    # Tier gates come from the precomputed flags and are shared by all sections.
+    flags = _TIER_FLAGS[tier]
+    # joined once per request and shared by the text builders
+    services_csv = ", ".join(data.services)
+    goals_csv = ", ".join(data.goals) or _DEFAULT_GOALS
+    # slug shared by every generated link
+    domain_root = data.business_name.lower().translate(_STRIP_SPACES)
+
+    business_summary = make_business_summary(data, services_csv, goals_csv)
+
+    # Every section below is an independent function of the values above, so
+    # the payload is described as a (field, builder) table. Should a builder
+    # become I/O-bound (e.g. an LLM call), this is the one place to fan them
+    # out with asyncio.gather/to_thread.
+    sections = (
+        ("brand_identity", partial(make_brand_identity, data)),
+        ("chatbot_persona", partial(make_chatbot_persona, data, business_summary, services_csv)),
+        ("website_structure", partial(make_website_structure, data, flags, services_csv)),
+        ("social_media_plan", partial(make_social_plan, data, flags)),
+        ("booking_tools", partial(make_booking_tools, data, flags, domain_root)),
+        ("sales_and_ads", partial(make_sales_ads, data, flags)),
+        ("sops", partial(make_sops, data, flags)),
+        ("automations", partial(make_automations, data, flags)),
+        ("dashboard", partial(make_dashboard, data, flags)),
+        ("social_oauth", partial(make_social_oauth, data)),
+        ("website_actions", partial(make_website_actions, data, flags)),
+        ("caller_bot", partial(make_caller_bot, data, flags)),
+        ("multi_platform", partial(make_multi_platform, data, flags)),
+        ("subscriptions", partial(make_subscriptions, tier)),
+        ("marketing_plan", partial(make_marketing_plan, data, flags)),
+        ("seo_keywords", partial(make_seo_keywords, data)),
+        ("user_access_links", partial(make_access_links, data, flags, domain_root)),
+    )
+
+    # The helpers already return plain dicts/lists, so the payload is built
+    # as a dict and handed straight to orjson. GenerationResult only
+    # documents the response shape in OpenAPI.
+    payload = {"business_summary": business_summary}
+    payload.update((name, build()) for name, build in sections)
+    payload["subscription_tier"] = tier
+    return payload
+
+
+# Generation is deterministic in the input, so identical requests share one
+# payload. Entries are keyed on the canonical JSON of the validated input and
+# evicted least-recently-used. Each entry pins its input (key and the copies
+# inside the payload), so only inputs whose JSON is at most
+# _PAYLOAD_CACHE_MAX_INPUT bytes of UTF-8 are cached; that keeps a worker's
+# cache bounded by size, not just entry count.
+_PAYLOAD_CACHE_MAX_ENTRIES = 1024
+_PAYLOAD_CACHE_MAX_INPUT = 4096
+_payload_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def build_payload_cached(data: BusinessInput, input_json: str) -> Dict[str, Any]:
+    # `data` is the already-validated model behind `input_json`, so a miss
+    # builds from it directly. The returned dict is shared between requests
+    # and must not be mutated.
+    payload = _payload_cache.get(input_json)
+    if payload is not None:
+        _payload_cache.move_to_end(input_json)
+        return payload
+
+    payload = build_payload(data, data.subscription_tier)
+    # the character count is a lower bound, so it screens out long inputs
+    # before encoding
+    if len(input_json) <= _PAYLOAD_CACHE_MAX_INPUT and len(input_json.encode()) <= _PAYLOAD_CACHE_MAX_INPUT:
+        _payload_cache[input_json] = payload
+        if len(_payload_cache) > _PAYLOAD_CACHE_MAX_ENTRIES:
+            _payload_cache.popitem(last=False)
+    return payload
+
+
+async def save_documents(items: List[tuple]) -> None:
+    try:
+        await create_documents_bulk_async(items)
+    except Exception as e:
+        # Don't fail generation if DB not available
+        logger.warning("DB save error: %s", e)
+
+
+def is_json_content_type(content_type: Optional[str]) -> bool:
+    # Same rule FastAPI applies to declared body parameters: a missing header is
+    # treated as JSON, otherwise application/json or application/*+json.
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
+
+
+def validate_business_input(value: Any, body: Any) -> BusinessInput:
+    try:
+        return BusinessInput.model_validate(value, from_attributes=True)
+    except ValidationError as e:
+        errors = [{**err, "loc": ("body", *err["loc"])} for err in e.errors()]
+        raise RequestValidationError(errors, body=body) from e
+
+
+def missing_body_error() -> RequestValidationError:
+    # FastAPI's error for a required body that is absent or JSON null
+    error = ValidationError.from_exception_data(
+        "Field required", [{"type": "missing", "loc": ("body",), "input": {}}]
+    ).errors()[0]
+    error["input"] = None
+    return RequestValidationError([error])
+
+
+async def read_business_input(request: Request) -> BusinessInput:
+    """Parse and validate the /generate body with FastAPI's body semantics.
+
+    The common case goes through pydantic-core's JSON parser in one pass instead
+    of json.loads followed by dict validation. Empty bodies, non-JSON content
+    types and bodies that fail validation fall back to the checks and 422/400
+    responses FastAPI produces for a declared body parameter.
+    """
+    body = await request.body()
+    if not body:
+        raise missing_body_error()
+    if not is_json_content_type(request.headers.get("content-type")):
+        # a simple (non-preflighted) CORS request can't carry a JSON content
+        # type, so these are rejected like FastAPI does: validated as raw bytes
+        return validate_business_input(body, body)
+
+    try:
+        return BusinessInput.model_validate_json(body)
+    except ValidationError:
+        # JSON-mode errors are worded differently, so any rejected body is
+        # redone the way FastAPI does it to report the same 422. json.loads
+        # also accepts UTF-16/32 bodies and gives the decode error position.
+        pass
+
+    try:
+        parsed = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "json_invalid",
+                    "loc": ("body", e.pos),
+                    "msg": "JSON decode error",
+                    "input": {},
+                    "ctx": {"error": e.msg},
+                }
+            ],
+            body=e.doc,
+        ) from e
+    except Exception as e:
+        raise HTTPException(status_code=400, detail="There was an error parsing the body") from e
+    if parsed is None:
+        raise missing_body_error()
+    return validate_business_input(parsed, parsed)
+
+
 # -----------------------------
 # Routes
 # -----------------------------
@@ -479,48 +763,69 @@ def read_root():
     return {"message": "AI Business Assistant Generator Backend"}
 
 
-@app.post("/generate", response_model=GenerationResult)
-def generate_assistant(data: BusinessInput):
-    tier = data.subscription_tier.lower()
-    if tier not in {"starter", "standard", "premium"}:
-        raise HTTPException(status_code=400, detail="subscription_tier must be one of: starter, standard, premium")
-
-    result = GenerationResult(
-        business_summary=make_business_summary(data),
-        brand_identity=make_brand_identity(data),
-        chatbot_persona=make_chatbot_persona(data),
-        website_structure=make_website_structure(data, tier),
-        social_media_plan=make_social_plan(data, tier),
-        booking_tools=make_booking_tools(data, tier),
-        sales_and_ads=make_sales_ads(data, tier),
-        sops=make_sops(data, tier),
-        automations=make_automations(data, tier),
-        dashboard=make_dashboard(data, tier),
-        social_oauth=make_social_oauth(data),
-        website_actions=make_website_actions(data, tier),
-        caller_bot=make_caller_bot(data, tier),
-        multi_platform=make_multi_platform(data, tier),
-        subscriptions=make_subscriptions(tier),
-        marketing_plan=make_marketing_plan(data, tier),
-        seo_keywords=make_seo_keywords(data),
-        user_access_links=make_access_links(data, tier),
-        subscription_tier=tier,
-        created_at=datetime.utcnow(),
-    )
+# The handler returns a ready ORJSONResponse, so no response_model is declared:
+# FastAPI would otherwise set up output validation and jsonable_encoder for it.
+# GenerationResult is still published as the 200 schema in OpenAPI.
+@app.post(
+    "/generate",
+    response_model=None,
+    responses={
+        200: {"model": GenerationResult},
+        422: {
+            "description": "Validation Error",
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}}},
+        },
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/BusinessInput"}}},
+        },
+    },
+)
+async def generate_assistant(request: Request, background_tasks: BackgroundTasks):
+    data = await read_business_input(request)
+
+    # One pass through pydantic-core's JSON serializer yields both the cache
+    # key and, via orjson, the stored input document; unset optionals are
+    # left out of the BSON.
+    input_json = data.model_dump_json(exclude_none=True)
+    payload = {
+        **build_payload_cached(data, input_json),
+        "created_at": datetime.now(timezone.utc),
+    }
 
-    # Persist both input and output
-    try:
-        create_document("businessinput", data.model_dump())
-        create_document("generationresult", result.model_dump())
-    except Exception as e:
-        # Don't fail generation if DB not available
-        print("DB save error:", e)
+    # Persist both input and output after the response has been sent.
+    input_doc = orjson.loads(input_json)
+    output_doc = {key: value for key, value in payload.items() if value is not None}
+    background_tasks.add_task(save_documents, [
+        ("businessinput", input_doc),
+        ("generationresult", output_doc),
+    ])
+
+    return ORJSONResponse(payload)
+
+
+# Connection settings don't change at runtime; read them once at import
+_HAS_DB_URL = bool(os.getenv("DATABASE_URL"))
+_HAS_DB_NAME = bool(os.getenv("DATABASE_NAME"))
 
-    return result
+_COLLECTIONS_TTL = 5.0  # seconds
+_collections_cache = {"fetched_at": None, "names": []}
+
+
+async def cached_collection_names() -> List[str]:
+    # /test is polled as a health check; avoid a listCollections round-trip per hit
+    now = time.monotonic()
+    fetched_at = _collections_cache["fetched_at"]
+    if fetched_at is None or now - fetched_at >= _COLLECTIONS_TTL:
+        _collections_cache["names"] = await async_db.list_collection_names()
+        _collections_cache["fetched_at"] = now
+    return _collections_cache["names"]
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -531,13 +836,13 @@ def test_database():
     }
 
     try:
-        if db is not None:
+        if async_db is not None:
             response["database"] = "✅ Available"
             response["database_url"] = "✅ Configured"
-            response["database_name"] = db.name if hasattr(db, "name") else "✅ Connected"
+            response["database_name"] = async_db.name if hasattr(async_db, "name") else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await cached_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -547,12 +852,47 @@ def test_database():
     except Exception as e:
         response["database"] = f"❌ Error: {str(e)[:50]}"
 
-    response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-    response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
+    response["database_url"] = "✅ Set" if _HAS_DB_URL else "❌ Not Set"
+    response["database_name"] = "✅ Set" if _HAS_DB_NAME else "❌ Not Set"
     return response
 
 
+def custom_openapi() -> Dict[str, Any]:
+    # /generate reads its body itself, so BusinessInput (and the models it
+    # references) and the validation error schemas FastAPI would have added
+    # for a declared body are registered as components by hand for the docs.
+    if app.openapi_schema is None:
+        # FastAPI's own generator, so every app-level OpenAPI setting still applies
+        schema = FastAPI.openapi(app)
+        body_schema = BusinessInput.model_json_schema(ref_template="#/components/schemas/{model}")
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        components.update(body_schema.pop("$defs", {}))
+        components["BusinessInput"] = body_schema
+        components["ValidationError"] = validation_error_definition
+        components["HTTPValidationError"] = validation_error_response_definition
+        schema["components"]["schemas"] = dict(sorted(components.items()))
+        # encoded the way get_openapi does, which drops the `default: null` entries
+        app.openapi_schema = jsonable_encoder(OpenAPI(**schema), by_alias=True, exclude_none=True)
+    return app.openapi_schema
+
+
+app.openapi = custom_openapi
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # "auto" picks the C-accelerated uvloop event loop and httptools parser when
+    # they're installed (uvloop isn't on Windows). workers > 1 needs the app
+    # passed as an import string. Per-request access logging is disabled
+    # outright rather than just filtered by level.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", 2)),
+        log_level="warning",
+        access_log=False,
+    )